@@ -1,358 +1,502 @@
 import streamlit as st
 import fitz
-import hashlib
 from PIL import Image
 import io
-import pandas as pd
+import os
+import multiprocessing
 import base64
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from reportlab.lib.units import inch
 
-
-# ----------------------------------------------------
-# App Setup
-# ----------------------------------------------------
-st.set_page_config(page_title="Inspection Photo Duplicate Checker", layout="wide")
-
-
-# ----------------------------------------------------
-# Session Keys
-# ----------------------------------------------------
-if "uploader_key" not in st.session_state:
-    st.session_state["uploader_key"] = 0
-if "batches" not in st.session_state:
-    st.session_state["batches"] = []
-if "all_files" not in st.session_state:
-    st.session_state["all_files"] = []
-if "pdf_bytes" not in st.session_state:
-    st.session_state["pdf_bytes"] = {}   # SAFE storage for file bytes
+from extraction import extract_photos, find_duplicates, fingerprint, load_images
 
 
 # ----------------------------------------------------
-# Reset App
+# Warm-up
 # ----------------------------------------------------
-if st.button("Reset App"):
-    for key in list(st.session_state.keys()):
-        if key not in ["uploader_key"]:
-            del st.session_state[key]
-    st.session_state["uploader_key"] += 1
-    st.rerun()
+# first use of MuPDF, PIL's JPEG codec and reportlab's fonts has a
+# one-off setup cost — pay it once per server process at startup
+# rather than on the first duplicate check
+@st.cache_resource(show_spinner=False)
+def warm_up():
+    fitz.open().close()
+    Image.new("RGB", (8, 8)).save(io.BytesIO(), format="JPEG")
+    c = canvas.Canvas(io.BytesIO(), pagesize=letter)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(0, 0, "")
+    c.save()
 
 
 # ----------------------------------------------------
-# Title
+# Extraction Pool
 # ----------------------------------------------------
-st.markdown("# Inspection Photo Duplicate Checker")
+EXTRACT_WORKERS = min(os.cpu_count() or 1, 8)
 
 
-# ----------------------------------------------------
-# File Upload
-# ----------------------------------------------------
-uploaded_files = st.file_uploader(
-    "Upload PDF Reports (multiple batches allowed)",
-    type=["pdf"],
-    accept_multiple_files=True,
-    key=f"uploader_{st.session_state['uploader_key']}"
-)
+# one pool per server process, reused by every click and session.
+# Workers are started by a forkserver (spawn where there is none)
+# instead of forking the multi-threaded Streamlit server; they are
+# started on demand, so a small batch only starts as many as it has
+# PDFs, and no more than EXTRACT_WORKERS are ever kept around
+@st.cache_resource(show_spinner=False)
+def extraction_pool():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["extraction"])
+    else:
+        ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=ctx)
 
 
 # ----------------------------------------------------
-# Batch Detection — FIXED
+# Thumbnails
 # ----------------------------------------------------
-if uploaded_files:
-    new_files = []
-    for f in uploaded_files:
-
-        if f not in st.session_state["all_files"]:
-
-            # READ BYTES ONCE AND STORE FOREVER
-            pdf_bytes = f.read()
-            st.session_state["pdf_bytes"][f.name] = pdf_bytes
+THUMB_SIZE = (400, 400)
 
-            new_files.append(f)
 
-    if new_files:
-        st.session_state["batches"].append(new_files)
-        st.session_state["all_files"].extend(new_files)
+# keyed on the photo hash only (bytes are skipped by the leading
+# underscore), so reruns and other sessions reuse the encoded JPEG
+@st.cache_data(show_spinner=False, max_entries=512)
+def make_thumbnail(img_hash, _img_bytes):
+    img = Image.open(io.BytesIO(_img_bytes))
+    # JPEGs are decoded straight at reduced scale; no-op for other formats
+    img.draft("RGB", THUMB_SIZE)
+    img.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=80, optimize=True)
+    return buf.getvalue()
 
 
-# Show Batches
-if st.session_state["batches"]:
-    st.subheader("Uploaded Batches:")
-    for i, batch in enumerate(st.session_state["batches"], start=1):
-        st.write(f"**Batch {i}: {len(batch)} files**")
+def card_image(img_hash, img_bytes, ext):
+    # a JPEG/PNG that already fits is sent as is — judged on the bytes
+    # we hold, since non-JPEG photos arrive as card-sized previews.
+    # Image.open only parses the header here
+    if ext in ("jpeg", "png"):
+        w, h = Image.open(io.BytesIO(img_bytes)).size
+        if w <= THUMB_SIZE[0] and h <= THUMB_SIZE[1]:
+            return img_bytes, ext
+    return make_thumbnail(img_hash, img_bytes), "jpeg"
 
 
-# Undo Batch
-if st.session_state["batches"]:
-    if st.button("Undo Last Batch"):
-        last = st.session_state["batches"].pop()
-
-        for f in last:
-            # Remove file and bytes
-            if f in st.session_state["all_files"]:
-                st.session_state["all_files"].remove(f)
-            if f.name in st.session_state["pdf_bytes"]:
-                del st.session_state["pdf_bytes"][f.name]
+# ----------------------------------------------------
+# Duplicate Cards
+# ----------------------------------------------------
+CARD_CSS = """
+<style>
+.dup-grid {
+    display: flex;
+    flex-wrap: wrap;
+    gap: 20px;
+    margin-top: 20px;
+}
+.dup-card {
+    width: 320px;
+    background: #1f1f1f;
+    border: 1px solid #333;
+    border-radius: 10px;
+    padding: 12px;
+    box-shadow: 0 0 8px rgba(0,0,0,0.4);
+}
+.dup-title {
+    font-family: monospace;
+    color: #4caf50;
+    text-align: center;
+    margin-bottom: 8px;
+}
+.dup-img {
+    width: 100%;
+    border-radius: 6px;
+}
+.dup-files {
+    margin-top: 10px;
+    color: #ddd;
+    font-size: 13px;
+}
+</style>
+"""
+
+# no newlines or indentation: joined cards must stay one markdown HTML
+# block, or a blank indented line turns the next card into a code block
+CARD_HTML = (
+    '<div class="dup-card">'
+    '<div class="dup-title">{title}</div>'
+    '<img class="dup-img" src="data:image/{ext};base64,{img}">'
+    '<div class="dup-files"><strong>Found in:</strong><br>{files}</div>'
+    '</div>'
+).format
+
+
+def build_card(img_hash, group, img_bytes, ext):
+    # cards are 320px wide — anything larger is shrunk to a JPEG first
+    img_bytes, ext = card_image(img_hash, img_bytes, ext)
+    img_b64 = base64.b64encode(img_bytes).decode()
+
+    file_list_html = "".join(
+        f"• {row['file']} (Pg {', '.join(map(str, row['pages']))})<br>"
+        for row in group
+    )
 
-        st.session_state["uploader_key"] += 1
-        st.rerun()
+    return CARD_HTML(title=img_hash.hex(), ext=ext, img=img_b64, files=file_list_html)
 
 
 # ----------------------------------------------------
-# Extract Photos
+# Page
 # ----------------------------------------------------
-def extract_photos(pdf_name, pdf_bytes):
-    out = []
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+# spawned extraction workers import this script again as __mp_main__
+# before they unpickle their task. They only need extraction.py, so
+# the page itself — setup, warm-up, widgets — is skipped there
+if __name__ != "__mp_main__":
 
-    for page_idx in range(len(doc)):
-        page = doc[page_idx]
-        for img in page.get_images(full=True):
+    # ----------------------------------------------------
+    # App Setup
+    # ----------------------------------------------------
+    st.set_page_config(page_title="Inspection Photo Duplicate Checker", layout="wide")
 
-            xref = img[0]
-            data = doc.extract_image(xref)
-            img_bytes = data["image"]
 
-            image = Image.open(io.BytesIO(img_bytes))
-            w, h = image.size
+    # ----------------------------------------------------
+    # Session Keys
+    # ----------------------------------------------------
+    if "uploader_key" not in st.session_state:
+        st.session_state["uploader_key"] = 0
+    if "batches" not in st.session_state:
+        st.session_state["batches"] = []
+    if "all_files" not in st.session_state:
+        st.session_state["all_files"] = []
+    if "pdf_bytes" not in st.session_state:
+        st.session_state["pdf_bytes"] = {}   # SAFE storage for file bytes
+    if "seen_upload_ids" not in st.session_state:
+        st.session_state["seen_upload_ids"] = set()
+    if "pdf_hashes" not in st.session_state:
+        st.session_state["pdf_hashes"] = {}   # name -> pdf fingerprint
+    if "last_check" not in st.session_state:
+        st.session_state["last_check"] = None   # (pdf keys, duplicates, images)
+    if "photo_cache" not in st.session_state:
+        st.session_state["photo_cache"] = {}   # pdf fingerprint -> photos
+
+
+    warm_up()
 
-            if w >= 300 and h >= 150:
-                md5 = hashlib.md5(img_bytes).hexdigest()
-                out.append({
-                    "file": pdf_name,
-                    "page": page_idx,
-                    "md5": md5,
-                    "image": image
-                })
-    return out
 
+    # ----------------------------------------------------
+    # Reset App
+    # ----------------------------------------------------
+    if st.button("Reset App"):
+        # photo_cache is keyed on file content, so it stays valid across resets
+        for key in list(st.session_state.keys()):
+            if key not in ["uploader_key", "photo_cache"]:
+                del st.session_state[key]
+        st.session_state["uploader_key"] += 1
+        st.rerun()
 
 
-# ----------------------------------------------------
-# Run Duplicate Check
-# ----------------------------------------------------
-if st.button("Run Duplicate Check"):
-
-    if not st.session_state["all_files"]:
-        st.error("Please upload files first.")
-        st.stop()
-
-    # Duplicate filename check
-    filenames = [f.name for f in st.session_state["all_files"]]
-    duplicated_filenames = {name for name in filenames if filenames.count(name) > 1}
-
-    if duplicated_filenames:
-        st.error("⚠️ Duplicate PDF filenames detected!")
-        st.warning(
-            "You uploaded the same file more than once:\n\n" +
-            "\n".join(f"• **{name}**" for name in duplicated_filenames) +
-            "\n\nRename or remove duplicates to continue."
-        )
-        st.stop()
+    # ----------------------------------------------------
+    # Title
+    # ----------------------------------------------------
+    st.markdown("# Inspection Photo Duplicate Checker")
 
-    # SAFE PDF BYTES CACHE
-    pdf_cache = st.session_state["pdf_bytes"]
 
-    status = st.info("Extracting inspection photos...")
-    all_photos = []
-    for pdf in st.session_state["all_files"]:
-        all_photos.extend(extract_photos(pdf.name, pdf_cache[pdf.name]))
-    status.empty()
+    # ----------------------------------------------------
+    # File Upload
+    # ----------------------------------------------------
+    uploaded_files = st.file_uploader(
+        "Upload PDF Reports (multiple batches allowed)",
+        type=["pdf"],
+        accept_multiple_files=True,
+        key=f"uploader_{st.session_state['uploader_key']}"
+    )
 
-    df = pd.DataFrame(all_photos)
 
-    if df.empty:
-        st.success("No inspection photos found.")
-        st.stop()
+    # ----------------------------------------------------
+    # Batch Detection — FIXED
+    # ----------------------------------------------------
+    if uploaded_files:
+        new_files = []
+        for f in uploaded_files:
+
+            # the uploader hands back every file on each rerun — set lookup
+            # instead of scanning all_files for each of them
+            if f.file_id not in st.session_state["seen_upload_ids"]:
+                st.session_state["seen_upload_ids"].add(f.file_id)
+
+                # READ BYTES ONCE AND STORE FOREVER
+                # (getvalue() doesn't depend on the stream position)
+                pdf_bytes = f.getvalue()
+                st.session_state["pdf_bytes"][f.name] = pdf_bytes
+                st.session_state["pdf_hashes"][f.name] = fingerprint(pdf_bytes)
+
+                new_files.append(f)
+
+        if new_files:
+            st.session_state["batches"].append(new_files)
+            st.session_state["all_files"].extend(new_files)
+
+
+    # Show Batches
+    if st.session_state["batches"]:
+        st.subheader("Uploaded Batches:")
+        for i, batch in enumerate(st.session_state["batches"], start=1):
+            st.write(f"**Batch {i}: {len(batch)} files**")
+
+
+    # Undo Batch
+    if st.session_state["batches"]:
+        if st.button("Undo Last Batch"):
+            last = st.session_state["batches"].pop()
+
+            for f in last:
+                # Remove file and bytes
+                if f in st.session_state["all_files"]:
+                    st.session_state["all_files"].remove(f)
+                st.session_state["seen_upload_ids"].discard(f.file_id)
+                if f.name in st.session_state["pdf_bytes"]:
+                    del st.session_state["pdf_bytes"][f.name]
+                if f.name in st.session_state["pdf_hashes"]:
+                    del st.session_state["pdf_hashes"][f.name]
+
+            # drop extracted photos that no remaining upload points to
+            live = set(st.session_state["pdf_hashes"].values())
+            st.session_state["photo_cache"] = {
+                pdf_hash: photos
+                for pdf_hash, photos in st.session_state["photo_cache"].items()
+                if pdf_hash in live
+            }
+
+            st.session_state["uploader_key"] += 1
+            st.rerun()
 
-    duplicates = df[df.duplicated("md5", keep=False)].sort_values("md5")
 
-    st.subheader("Duplicate Photo Results")
+    # ----------------------------------------------------
+    # Run Duplicate Check
+    # ----------------------------------------------------
+    if st.button("Run Duplicate Check"):
+
+        if not st.session_state["all_files"]:
+            st.error("Please upload files first.")
+            st.stop()
+
+        # Duplicate filename check
+        filenames = [f.name for f in st.session_state["all_files"]]
+        duplicated_filenames = {name for name, n in Counter(filenames).items() if n > 1}
+
+        if duplicated_filenames:
+            st.error("⚠️ Duplicate PDF filenames detected!")
+            st.warning(
+                "You uploaded the same file more than once:\n\n" +
+                "\n".join(f"• **{name}**" for name in duplicated_filenames) +
+                "\n\nRename or remove duplicates to continue."
+            )
+            st.stop()
+
+        # SAFE PDF BYTES CACHE
+        pdf_cache = st.session_state["pdf_bytes"]
+
+        # extraction results survive reruns; keyed on content, so a changed
+        # file is extracted again and an identical copy uploaded under
+        # another name reuses the photos of the first one. Entries kept
+        # across a Reset are dropped here unless their PDF came back
+        pdf_hashes = st.session_state["pdf_hashes"]
+        live = set(pdf_hashes.values())
+        photo_cache = {
+            pdf_hash: photos
+            for pdf_hash, photos in st.session_state["photo_cache"].items()
+            if pdf_hash in live
+        }
+        st.session_state["photo_cache"] = photo_cache
+        pdfs = st.session_state["all_files"]
+        todo = {}
+        for pdf in pdfs:
+            if pdf_hashes[pdf.name] not in photo_cache:
+                todo.setdefault(pdf_hashes[pdf.name], pdf.name)
+
+        if todo:
+            status = st.info("Extracting inspection photos...")
+            progress = st.progress(0.0)
+
+            # PDFs are independent — extract them in parallel worker processes
+            pool = extraction_pool()
+            try:
+                futures = {
+                    pool.submit(extract_photos, name, pdf_cache[name]): pdf_hash
+                    for pdf_hash, name in todo.items()
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    photo_cache[futures[future]] = future.result()
+                    progress.progress(done / len(futures))
+            except BrokenProcessPool:
+                # a crashed worker leaves the pool unusable — shut it down
+                # without waiting and start a new one on the next check
+                pool.shutdown(wait=False, cancel_futures=True)
+                extraction_pool.clear()
+                raise
+
+            progress.empty()
+            status.empty()
+
+        # keep upload order regardless of completion order; cached photos
+        # are relabelled with the name each copy was uploaded under
+        all_photos = []
+        for pdf in pdfs:
+            all_photos.extend(dict(photo, file=pdf.name) for photo in photo_cache[pdf_hashes[pdf.name]])
+
+        if not all_photos:
+            st.success("No inspection photos found.")
+            st.stop()
+
+        # same PDFs as the previous check — reuse its result instead of
+        # reopening the candidates and hashing them again
+        check_key = tuple((pdf.name, pdf_hashes[pdf.name]) for pdf in pdfs)
+        last_check = st.session_state["last_check"]
+        if last_check and last_check[0] == check_key:
+            duplicates, images = last_check[1], last_check[2]
+        else:
+            duplicates = find_duplicates(all_photos, pdf_cache)
+            # read only the one photo shown per duplicate set
+            images = load_images([group[0] for group in duplicates.values()], pdf_cache, THUMB_SIZE)
+            st.session_state["last_check"] = (check_key, duplicates, images)
+
+        st.subheader("Duplicate Photo Results")
+
+        if not duplicates:
+            st.success("No duplicates detected.")
+            st.stop()
+
+        st.error("Duplicate inspection photos detected.")
+
+        # intelligent grouping — union-find over filenames, so a duplicate
+        # that links two existing groups joins them into one
+        parent = {}
+
+        def find(name):
+            parent.setdefault(name, name)
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+
+        def merge_group(files):
+            root = find(files[0])
+            for name in files[1:]:
+                parent[find(name)] = root
+
+        # Render duplicate cards — collected and emitted together with the
+        # styles as one block so the grid wrapper really contains the cards
+        cards = [CARD_CSS, "<div class='dup-grid'>"]
+        for img_hash, group in duplicates.items():
+
+            merge_group([row["file"] for row in group])
+
+            first = group[0]
+            cards.append(build_card(img_hash, group, *images[(first["file"], first["xref"])]))
+
+        cards.append("</div>")
+        st.markdown("".join(cards), unsafe_allow_html=True)
+
+        report_groups = {}
+        for name in parent:
+            report_groups.setdefault(find(name), set()).add(name)
+        report_groups = list(report_groups.values())
+
+        # ----------------------------------------------------
+        # SUMMARY
+        # ----------------------------------------------------
+        st.subheader("Reports Containing Duplicate Photos (Grouped by Relation)")
 
-    if duplicates.empty:
-        st.success("No duplicates detected.")
-        st.stop()
+        for i, group in enumerate(report_groups, start=1):
+            st.markdown(f"### Group {i}")
+            for file in sorted(group):
+                st.write(f"• {file}")
 
-    st.error("Duplicate inspection photos detected.")
 
-    # ----------------------------------------------------
-    # CSS for Cards
-    # ----------------------------------------------------
-    st.markdown("""
-    <style>
-    .dup-grid {
-        display: flex;
-        flex-wrap: wrap;
-        gap: 20px;
-        margin-top: 20px;
-    }
-    .dup-card {
-        width: 320px;
-        background: #1f1f1f;
-        border: 1px solid #333;
-        border-radius: 10px;
-        padding: 12px;
-        box-shadow: 0 0 8px rgba(0,0,0,0.4);
-    }
-    .dup-title {
-        font-family: monospace;
-        color: #4caf50;
-        text-align: center;
-        margin-bottom: 8px;
-    }
-    .dup-img {
-        width: 100%;
-        border-radius: 6px;
-    }
-    .dup-files {
-        margin-top: 10px;
-        color: #ddd;
-        font-size: 13px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-    st.markdown("<div class='dup-grid'>", unsafe_allow_html=True)
-
-    # intelligent grouping
-    report_groups = []
-
-    def merge_group(new_set):
-        for group in report_groups:
-            if group & new_set:
-                group |= new_set
-                return
-        report_groups.append(set(new_set))
-
-    # Render duplicate cards
-    for md5_hash, group in duplicates.groupby("md5"):
-
-        files = set(group["file"].unique())
-        merge_group(files)
-
-        first_img = group.iloc[0]["image"]
-        buf = io.BytesIO()
-        first_img.save(buf, format="PNG")
-        img_b64 = base64.b64encode(buf.getvalue()).decode()
-
-        file_list_html = "".join(
-            f"• {row['file']} (Pg {row['page']})<br>"
-            for _, row in group.iterrows()
-        )
+        # ----------------------------------------------------
+        # PDF EXPORT BUTTON (SAFE)
+        # ----------------------------------------------------
+        def generate_pdf():
+            buffer = io.BytesIO()
+            c = canvas.Canvas(buffer, pagesize=letter)
 
-        card_html = f"""
-        <div class="dup-card">
-            <div class="dup-title">{md5_hash}</div>
-            <img class="dup-img" src="data:image/png;base64,{img_b64}">
-            <div class="dup-files"><strong>Found in:</strong><br>{file_list_html}</div>
-        </div>
-        """
+            width, height = letter
+            margin = 40
+            y = height - margin
 
-        st.markdown(card_html, unsafe_allow_html=True)
+            # TITLE
+            c.setFont("Helvetica-Bold", 20)
+            c.drawString(margin, y, "Inspection Photo Duplicate Report")
+            y -= 40
 
-    st.markdown("</div>", unsafe_allow_html=True)
+            c.setFont("Helvetica-Bold", 16)
+            c.drawString(margin, y, "Duplicate Photo Sets")
+            y -= 30
 
-    # ----------------------------------------------------
-    # SUMMARY
-    # ----------------------------------------------------
-    st.subheader("Reports Containing Duplicate Photos (Grouped by Relation)")
+            for img_hash, group in duplicates.items():
 
-    for i, group in enumerate(report_groups, start=1):
-        st.markdown(f"### Group {i}")
-        for file in sorted(group):
-            st.write(f"• {file}")
+                c.setFont("Helvetica-Bold", 12)
+                c.drawString(margin, y, f"Hash: {img_hash.hex()}")
+                y -= 18
 
+                # same image as the card; reportlab embeds JPEG data as is,
+                # so nothing is decoded or re-encoded for the report
+                first = group[0]
+                thumb = card_image(img_hash, *images[(first["file"], first["xref"])])[0]
+                img = ImageReader(io.BytesIO(thumb))
+                img_w, img_h = 2.5 * inch, 2.5 * inch
 
-    # ----------------------------------------------------
-    # PDF EXPORT BUTTON (SAFE)
-    # ----------------------------------------------------
-    def generate_pdf():
-        buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-
-        width, height = letter
-        margin = 40
-        y = height - margin
-
-        # TITLE
-        c.setFont("Helvetica-Bold", 20)
-        c.drawString(margin, y, "Inspection Photo Duplicate Report")
-        y -= 40
-
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(margin, y, "Duplicate Photo Sets")
-        y -= 30
-
-        for md5_hash, group in duplicates.groupby("md5"):
-
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(margin, y, f"MD5: {md5_hash}")
-            y -= 18
-
-            first_img = group.iloc[0]["image"]
-            buf = io.BytesIO()
-            first_img.thumbnail((250, 250))
-            first_img.save(buf, format="PNG")
-            buf.seek(0)
-
-            img = ImageReader(buf)
-            img_w, img_h = 2.5 * inch, 2.5 * inch
-
-            if y - img_h < margin:
-                c.showPage()
-                y = height - margin
-
-            c.drawImage(img, margin, y - img_h, width=img_w, height=img_h)
-            y -= img_h + 10
-
-            c.setFont("Helvetica", 11)
-            for _, row in group.iterrows():
-                c.drawString(margin, y, f"• {row['file']} — Page {row['page']}")
-                y -= 14
-                if y < margin:
+                if y - img_h < margin:
                     c.showPage()
                     y = height - margin
 
-            y -= 15
+                c.drawImage(img, margin, y - img_h, width=img_w, height=img_h)
+                y -= img_h + 10
 
-        # SUMMARY PAGE
-        c.showPage()
-        y = height - margin
+                c.setFont("Helvetica", 11)
+                for row in group:
+                    pages = ", ".join(map(str, row["pages"]))
+                    c.drawString(margin, y, f"• {row['file']} — Page {pages}")
+                    y -= 14
+                    if y < margin:
+                        c.showPage()
+                        y = height - margin
 
-        c.setFont("Helvetica-Bold", 18)
-        c.drawString(margin, y, "Summary — Related Reports")
-        y -= 30
+                y -= 15
 
-        for i, group in enumerate(report_groups, start=1):
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(margin, y, f"Group {i}")
-            y -= 20
+            # SUMMARY PAGE
+            c.showPage()
+            y = height - margin
 
-            c.setFont("Helvetica", 12)
-            for file in sorted(group):
-                c.drawString(margin, y, f"• {file}")
-                y -= 15
-                if y < margin:
-                    c.showPage()
-                    y = height - margin
+            c.setFont("Helvetica-Bold", 18)
+            c.drawString(margin, y, "Summary — Related Reports")
+            y -= 30
 
-            y -= 20
+            for i, group in enumerate(report_groups, start=1):
+                c.setFont("Helvetica-Bold", 14)
+                c.drawString(margin, y, f"Group {i}")
+                y -= 20
 
-        c.save()
-        buffer.seek(0)
-        return buffer
+                c.setFont("Helvetica", 12)
+                for file in sorted(group):
+                    c.drawString(margin, y, f"• {file}")
+                    y -= 15
+                    if y < margin:
+                        c.showPage()
+                        y = height - margin
 
+                y -= 20
 
-    pdf_buffer = generate_pdf()
+            c.save()
+            buffer.seek(0)
+            return buffer
 
-    st.download_button(
-        label="📄 Download PDF Report",
-        data=pdf_buffer,
-        file_name="duplicate_photo_report.pdf",
-        mime="application/pdf"
-    )
+
+        pdf_buffer = generate_pdf()
+
+        st.download_button(
+            label="📄 Download PDF Report",
+            data=pdf_buffer,
+            file_name="duplicate_photo_report.pdf",
+            mime="application/pdf"
+        )
@@ -0,0 +1,184 @@
+import fitz
+import hashlib
+import io
+from PIL import Image
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# ----------------------------------------------------
+# Extract Photos
+# ----------------------------------------------------
+HASH_WORKERS = 4
+SAMPLE_BYTES = 32      # per window of the duplicate prefilter sample
+
+# stream filters whose raw bytes already are a complete image file
+RAW_IMAGE_FILTERS = {"/DCTDecode": "jpeg", "/JPXDecode": "jpx"}
+
+
+def fingerprint(data):
+    # SHA-256 goes through OpenSSL, which uses the SHA-NI instructions
+    # where the CPU has them; 128 bits of it are plenty as an identity key.
+    # Raw digest bytes, not hex: half the size and cheaper to hash as a
+    # dict key — format with .hex() only for display
+    return hashlib.sha256(data).digest()[:16]
+
+
+def read_image(doc, xref):
+    # JPEG/JPEG2000 streams are stored ready to use — take them verbatim
+    # instead of letting extract_image rebuild the image
+    ext = RAW_IMAGE_FILTERS.get(doc.xref_get_key(xref, "Filter")[1])
+    if ext:
+        return doc.xref_stream_raw(xref), ext
+
+    data = doc.extract_image(xref)
+    return data["image"], data["ext"]
+
+
+def read_preview(doc, xref, max_size):
+    # display path: JPEG/JPEG2000 go out untouched; anything else is
+    # decoded once by MuPDF and handed to PIL straight from the pixmap
+    # samples, instead of extract_image's PNG encode + PIL's PNG decode
+    ext = RAW_IMAGE_FILTERS.get(doc.xref_get_key(xref, "Filter")[1])
+    if ext:
+        return doc.xref_stream_raw(xref), ext
+
+    pix = fitz.Pixmap(doc, xref)
+    if pix.colorspace is None:
+        # stencil masks have no colour space to convert from
+        return read_image(doc, xref)
+    # compare by name: Lab also has 3 components but is not RGB
+    if pix.colorspace.name != fitz.csRGB.name:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+
+    img = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+    img.thumbnail(max_size)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=80)
+    return buf.getvalue(), "jpeg"
+
+
+def sample(raw):
+    # head, middle and tail windows of the stream — cheap to keep per
+    # photo, and enough to tell apart almost all same-sized photos
+    n = SAMPLE_BYTES
+    mid = len(raw) // 2
+    return raw[:n] + raw[mid:mid + n] + raw[-n:]
+
+
+def prefilter_key(doc, xref, w, h):
+    # JPEG/JPEG2000 photos are compared on their stored stream, so its
+    # length and sampled bytes must match too. Anything else is compared
+    # on the image MuPDF rebuilds from the decoded pixels, where only the
+    # dimensions are known without decoding
+    if doc.xref_get_key(xref, "Filter")[1] in RAW_IMAGE_FILTERS:
+        raw = doc.xref_stream_raw(xref)
+        return (w, h, len(raw), sample(raw))
+    return (w, h)
+
+
+def extract_photos(pdf_name, pdf_bytes):
+    # metadata pass only: no image stream is decompressed here — bytes are
+    # read later, and only for photos that may turn out to be duplicates
+    photos = {}
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+    try:
+        # same image object (xref) is often placed on many pages —
+        # one record per xref, listing every page it appears on
+        for page_idx, page in enumerate(doc):
+            for img in page.get_images(full=False):
+
+                # width/height come with the image listing, so small
+                # icons and logos are rejected without being decompressed
+                xref, w, h = img[0], img[2], img[3]
+                if w < 300 or h < 150:
+                    continue
+
+                if xref in photos:
+                    photos[xref]["pages"].append(page_idx)
+                    continue
+
+                photos[xref] = {
+                    "file": pdf_name,
+                    "pages": [page_idx],
+                    "xref": xref,
+                    "width": w,
+                    "height": h,
+                    "key": prefilter_key(doc, xref, w, h)
+                }
+    finally:
+        # release the document and empty MuPDF's global object store,
+        # otherwise RSS keeps growing with every PDF processed
+        doc.close()
+        fitz.TOOLS.store_shrink(100)
+
+    return list(photos.values())
+
+
+def read_xrefs(photos, pdf_bytes_by_name, reader):
+    # open each PDF once and read the requested image objects from it
+    xrefs_by_file = defaultdict(set)
+    for photo in photos:
+        xrefs_by_file[photo["file"]].add(photo["xref"])
+
+    out = {}
+    for name, xrefs in xrefs_by_file.items():
+        doc = fitz.open(stream=pdf_bytes_by_name[name], filetype="pdf")
+        try:
+            for xref in xrefs:
+                out[(name, xref)] = reader(doc, xref)
+        finally:
+            doc.close()
+            fitz.TOOLS.store_shrink(100)
+    return out
+
+
+def load_images(photos, pdf_bytes_by_name, max_size):
+    return read_xrefs(photos, pdf_bytes_by_name, lambda doc, xref: read_preview(doc, xref, max_size))
+
+
+# ----------------------------------------------------
+# Find Duplicates
+# ----------------------------------------------------
+def find_duplicates(photos, pdf_bytes_by_name):
+    # identical images must share their prefilter key, so a photo whose
+    # key is unique is never read or hashed. The key only prefilters —
+    # the full hash below still decides what is a duplicate
+    by_key = defaultdict(list)
+    for photo in photos:
+        by_key[photo["key"]].append(photo)
+
+    # a photo repeated across pages of one report is a duplicate by itself
+    candidates = [
+        photo
+        for bucket in by_key.values()
+        if len(bucket) > 1 or len(bucket[0]["pages"]) > 1
+        for photo in bucket
+    ]
+
+    # clean run (the common case): no keys collide, so no PDF is
+    # reopened and no hashing is set up at all
+    if not candidates:
+        return {}
+
+    # hash the image bytes extract_image would give — the stored stream
+    # for JPEG/JPEG2000, the image rebuilt from the pixels for the rest,
+    # so the same photo compressed differently still matches. Each image
+    # goes to the pool as soon as it is read and only its digest is kept;
+    # hashlib releases the GIL, so hashing runs alongside the next read
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        futures = read_xrefs(candidates, pdf_bytes_by_name, lambda doc, xref: pool.submit(fingerprint, read_image(doc, xref)[0]))
+    hashes = {key: future.result() for key, future in futures.items()}
+
+    by_hash = defaultdict(list)
+    for photo in candidates:
+        photo["hash"] = hashes[(photo["file"], photo["xref"])]
+        by_hash[photo["hash"]].append(photo)
+
+    return {
+        h: rows for h, rows in by_hash.items()
+        if sum(len(row["pages"]) for row in rows) > 1
+    }